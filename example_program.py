@@ -7,11 +7,42 @@ A few things to be aware of:
 * All data is read/written to/from the socket as bytes, so if a command is built
 as a string type, it will need to be converted to bytes before sending it. Just use
 the str.encode() method to do this.
+* Responses are returned as raw bytes too. Use bytes.decode() when a string is
+actually needed.
 """
 
+import asyncio
+import atexit
 import logging
-from telnetlib import Telnet
-from typing import Optional
+import select
+import socket
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+# idle laser sockets released with close_connection(reuse=True), keyed by
+# (ip address, port number), so a program that opens and closes the same
+# laser repeatedly can skip reconnecting
+_POOL: Dict[Tuple[str, int], List[socket.socket]] = {}
+
+
+def close_idle_connections():
+    """
+    Closes all the idle laser sockets held in the connection pool.
+    """
+    for pool in list(_POOL.values()):
+        while True:
+            try:
+                sock = pool.pop()
+            except IndexError:
+                break
+            sock.close()
+#end def
+
+
+# the laser may only accept one client at a time, so don't hold idle sockets
+# open past the end of the program
+atexit.register(close_idle_connections)
 
 
 class MerionLaserConnection:
@@ -23,6 +54,14 @@ class MerionLaserConnection:
     TIMEOUT = 5
     SEND_PACKET_TERMINATOR = b'\r\n'  # sent at end of each command
     READ_PACKET_TERMINATOR = b'\n> '  # laser sends this at end of a response
+    READ_BUFFER_SIZE = 4096  # max bytes taken from the socket per recv
+    SOCKET_BUFFER_SIZE = 65536  # kernel send/receive buffer size (SO_SNDBUF/SO_RCVBUF)
+    MAX_IDLE_CONNECTIONS = 4  # idle sockets kept in the pool per laser
+
+    # command packet templates, filled in with bytes %-formatting
+    PROPGET_TEMPLATE = b'propget /%b/%b/%b %b' + SEND_PACKET_TERMINATOR
+    SET_TEMPLATE = b'set /%b/%b/%b %b' + SEND_PACKET_TERMINATOR
+    GET_TEMPLATE = b'get /%b/%b/%b' + SEND_PACKET_TERMINATOR
 
 
     def __init__(self, ipaddr: str, portnum: int = PORT_NUMBER) -> None:
@@ -35,13 +74,19 @@ class MerionLaserConnection:
         """
         self._ip_addr = ipaddr
         self._port_num = portnum
-        self._connection: Optional[Telnet] = None
+        self._connection: Optional[socket.socket] = None
+        self._rx_buffer = bytearray()  # received bytes not yet returned as a response
+        self._pending_responses = 0  # commands sent whose responses haven't been read
     #end def
 
 
     def open_connection(self) -> bool:
         """
-        Open a socket (telnet) connection
+        Open a socket connection, reusing an idle one from the connection pool
+        if there is one. Nagle's algorithm is disabled (TCP_NODELAY) since each
+        command is a tiny packet that waits on a response, and otherwise could
+        be held back by the delayed ACK from the laser. The send/receive
+        buffers are enlarged so bursts of commands don't stall.
 
         Returns:
             bool: True if successful
@@ -49,10 +94,21 @@ class MerionLaserConnection:
         result = False
 
         try:
-            self._connection = Telnet(host=self._ip_addr, port=self._port_num, timeout=self.TIMEOUT)
+            sock = self._take_idle_socket()
+            if sock is None:
+                sock = socket.create_connection(
+                    (self._ip_addr, self._port_num), timeout=self.TIMEOUT
+                )
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.SOCKET_BUFFER_SIZE)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.SOCKET_BUFFER_SIZE)
+
+            self._connection = sock
+            self._rx_buffer.clear()
+            self._pending_responses = 0
             result = True
 
-        except TimeoutError:
+        except (TimeoutError, socket.timeout):
             logging.error(f'Could not find laser at {self._port_num}')
 
         except ConnectionRefusedError:
@@ -62,51 +118,103 @@ class MerionLaserConnection:
     #end def
 
 
-    def close_connection(self):
+    def _take_idle_socket(self) -> Optional[socket.socket]:
+        """
+        Takes an idle socket for this laser from the connection pool. Sockets
+        that became readable while idle (closed by the laser, or holding
+        unexpected data) are closed and skipped.
+
+        Returns:
+            Optional[socket.socket]: usable socket, or None.
+        """
+        pool = _POOL.get((self._ip_addr, self._port_num))
+        if pool is None:
+            return None
+
+        while True:
+            # another thread may empty the pool at any time, so pop and
+            # handle IndexError instead of checking the list first
+            try:
+                sock = pool.pop()
+            except IndexError:
+                return None
+
+            readable, _, _ = select.select([sock], [], [], 0)
+            if not readable:
+                return sock
+            sock.close()
+    #end def
+
+
+    def close_connection(self, reuse: bool = False):
         """
         Closes the socket connection to the laser.
+
+        With reuse=True the socket is instead kept open in the connection pool,
+        for the next open_connection() to this laser in the same program. The
+        laser may only accept one client at a time, so pooled sockets lock out
+        other programs until close_idle_connections() is called or the program
+        exits. The socket is only pooled if every command sent on it has had
+        its response read and no received data is left over, since a late
+        response would be read as the answer to the next user's command.
+
+        Args:
+            reuse (bool, optional): keep the socket for reuse. Defaults to False.
         """
         if self._connection is not None:
-            self._connection.close()
+            pool = _POOL.setdefault((self._ip_addr, self._port_num), [])
+            idle = not self._pending_responses and not self._rx_buffer
+            if reuse and idle and len(pool) < self.MAX_IDLE_CONNECTIONS:
+                pool.append(self._connection)
+            else:
+                self._connection.close()
+            self._connection = None
     #end def
 
 
-    def send_command_to_laser(
-            self,
-            command: str, tree: str, branch: str, function: str,
-            parameter: str = '', value: str = ''
+    def send_propget_to_laser(
+            self, tree: bytes, branch: bytes, function: bytes, parameter: bytes
         ) -> bool:
         """
-        Sends a command to the laser.
+        Queries a property of a function: propget /tree/branch/function parameter
 
         Args:
-            command (str): base command
-            tree (str): command tree
-            branch (str): command branch
-            function (str): function
-            parameter (str, optional): optional parameter value. Defaults to ''.
-            value (str, optional): optional value. Defaults to ''.
-        """
-        if parameter:
-            # this will manipulate a property: propget /tree/branch/function parameter
-            cmd_str = f'{command} /{tree}/{branch}/{function} {parameter}'.encode()
-        elif value:
-            # set /tree/branch/function value
-            cmd_str = f'{command} /{tree}/{branch}/{function} {value}'.encode()
-        else:
-            # get
-            cmd_str = f'{command} /{tree}/{branch}/{function}'.encode()
+            tree (bytes): command tree
+            branch (bytes): command branch
+            function (bytes): function
+            parameter (bytes): property to query, e.g. b'limitmax'
+        """
+        packet = self.PROPGET_TEMPLATE % (tree, branch, function, parameter)
+        return self.send_packet_to_laser(packet)
+    #end def
 
-        assert self._connection, 'Socket connection to laser must be open'
 
-        # send the command to laser over socket connection
-        try:
-            self._connection.write(cmd_str + self.SEND_PACKET_TERMINATOR)
-            return True
+    def send_set_to_laser(
+            self, tree: bytes, branch: bytes, function: bytes, value: bytes
+        ) -> bool:
+        """
+        Sets the value of a function: set /tree/branch/function value
 
-        except Exception as err:
-            logging.exception(err)
-            return False
+        Args:
+            tree (bytes): command tree
+            branch (bytes): command branch
+            function (bytes): function
+            value (bytes): new value
+        """
+        return self.send_packet_to_laser(self.SET_TEMPLATE % (tree, branch, function, value))
+    #end def
+
+
+    def send_get_to_laser(self, tree: bytes, branch: bytes, function: bytes) -> bool:
+        """
+        Gets the value of a function: get /tree/branch/function
+
+        Args:
+            tree (bytes): command tree
+            branch (bytes): command branch
+            function (bytes): function
+        """
+        return self.send_packet_to_laser(self.GET_TEMPLATE % (tree, branch, function))
     #end def
 
 
@@ -119,16 +227,45 @@ class MerionLaserConnection:
             alias (str): short-cut command
             value (str, optional): parameter value. Defaults to ''.
         """
+        return self.send_packet_to_laser(self.build_alias_packet(alias, value))
+    #end def
+
+
+    @classmethod
+    def build_alias_packet(cls, alias: str, value: str = '') -> bytes:
+        """
+        Builds a complete alias command packet, including the terminator. See
+        send_alias_command_to_laser() for the arguments.
+
+        Returns:
+            bytes: the packet to send to the laser.
+        """
         if value:
             cmd_str = f'{alias} {value}'.encode()
         else:
             cmd_str = f'{alias}'.encode()
 
-        assert self._connection, 'Socket connection to laser must be open'
+        return cmd_str + cls.SEND_PACKET_TERMINATOR
+    #end def
+
+
+    def send_packet_to_laser(self, packet: bytes) -> bool:
+        """
+        Sends a complete packet (command plus SEND_PACKET_TERMINATOR) to the laser.
+        The packet goes out in a single sendall() call, so the command and its
+        terminator are never split across two TCP segments.
+
+        Args:
+            packet (bytes): the command, already terminated.
+
+        Returns:
+            bool: True if successful
+        """
+        # each terminator ends one command, and each command gets one response
+        self._pending_responses += packet.count(self.SEND_PACKET_TERMINATOR)
 
         try:
-            # send command
-            self._connection.write(cmd_str + self.SEND_PACKET_TERMINATOR)
+            self._connection.sendall(packet)
             return True
 
         except Exception as err:
@@ -137,25 +274,262 @@ class MerionLaserConnection:
     #end def
 
 
-    def read_response(self) -> Optional[str]:
+    def pipeline(self, packets: List[bytes]) -> List[Optional[bytes]]:
         """
-        Get a response from the laser.
+        Sends several complete packets (command plus SEND_PACKET_TERMINATOR) to
+        the laser in one sendall() call, then reads back one response per packet.
+        This costs a single network round trip instead of one per command, but
+        only works when no command depends on the response to an earlier one.
+
+        Reading stops at the first missing response, since any later responses
+        could no longer be matched to their commands.
+
+        Args:
+            packets (List[bytes]): commands to send, each already terminated.
 
         Returns:
-            Optional[str]: laser response, or None.
+            List[Optional[bytes]]: laser responses in the order the packets
+            were given, with None for each one that was not read, or an empty
+            list if the packets could not be sent.
+        """
+        if not self.send_packet_to_laser(b''.join(packets)):
+            return []
+
+        responses: List[Optional[bytes]] = []
+        for _ in packets:
+            resp = self.read_response()
+            if resp is None:
+                break
+            responses.append(resp)
+
+        # pad out the responses that were never read
+        return responses + [None] * (len(packets) - len(responses))
+    #end def
+
+
+    def read_response(self, timeout: Optional[float] = None) -> Optional[bytes]:
+        """
+        Get a response from the laser as raw bytes. The response is not decoded
+        or stripped of surrounding whitespace; callers that need a str can use
+        resp.decode().strip().
+
+        Args:
+            timeout (float, optional): seconds to wait for the response.
+                Defaults to TIMEOUT.
+
+        Returns:
+            Optional[bytes]: laser response, or None.
         """
         assert self._connection, 'Socket connection to laser must be open'
 
-        # check for a response
-        response = self._connection.read_until(self.READ_PACKET_TERMINATOR, timeout=self.TIMEOUT)
-        if response:
-            # get part of response before the terminator
-            result, *_ = response.partition(self.READ_PACKET_TERMINATOR)
-        else:
-            result = None
+        # check for a complete response, waiting with select() until the socket
+        # has data and then reading whole chunks into the receive buffer until
+        # the terminator arrives. Anything received after the terminator is
+        # kept for the next call.
+        rx_buffer = self._rx_buffer
+        terminator = self.READ_PACKET_TERMINATOR
+        deadline = time.monotonic() + (self.TIMEOUT if timeout is None else timeout)
+
+        index = rx_buffer.find(terminator)
+        while index < 0:
+            # always check the socket at least once, so a zero timeout still
+            # picks up a response that is already waiting
+            remaining = max(deadline - time.monotonic(), 0)
+            readable, _, _ = select.select([self._connection], [], [], remaining)
+            if not readable:
+                # no complete response, leave partial data for the next read. A
+                # caller that chose its own (usually short) timeout expects this.
+                log = logging.error if timeout is None else logging.debug
+                log('Timed out waiting for a response from the laser')
+                return None
+
+            chunk = self._connection.recv(self.READ_BUFFER_SIZE)
+            if not chunk:
+                logging.error('Connection closed while waiting for a response from the laser')
+                return None
+
+            # only rescan the tail that could hold a new terminator
+            start = max(len(rx_buffer) - len(terminator) + 1, 0)
+            rx_buffer += chunk
+            index = rx_buffer.find(terminator, start)
+
+        # get part of response before the terminator
+        result = bytes(rx_buffer[:index])
+        del rx_buffer[:index + len(terminator)]
+        self._pending_responses = max(self._pending_responses - 1, 0)
+        return result
+    #end def
+#end class
+
+
+class AsyncMerionLaserConnection:
+    """
+    asyncio version of MerionLaserConnection. One event loop can use several
+    of these to talk to many lasers at once, so the total time is bounded by
+    the slowest round trip rather than the sum of them all.
+    """
+    PORT_NUMBER = MerionLaserConnection.PORT_NUMBER
+    TIMEOUT = MerionLaserConnection.TIMEOUT
+    READ_PACKET_TERMINATOR = MerionLaserConnection.READ_PACKET_TERMINATOR
+    SOCKET_BUFFER_SIZE = MerionLaserConnection.SOCKET_BUFFER_SIZE
+
+
+    def __init__(self, ipaddr: str, portnum: int = PORT_NUMBER) -> None:
+        """
+        Initialize the class
+
+        Args:
+            ipaddr (str): ip address of the laser
+            portnum (int): socket port number, defaults to 10001
+        """
+        self._ip_addr = ipaddr
+        self._port_num = portnum
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+    #end def
+
+
+    async def open_connection(self) -> bool:
+        """
+        Open a socket connection, with the same socket options as
+        MerionLaserConnection.open_connection().
+
+        Returns:
+            bool: True if successful
+        """
+        result = False
+
+        try:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self._ip_addr, self._port_num), timeout=self.TIMEOUT
+            )
+            sock = self._writer.get_extra_info('socket')
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.SOCKET_BUFFER_SIZE)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.SOCKET_BUFFER_SIZE)
+            result = True
+
+        except (asyncio.TimeoutError, TimeoutError):
+            # before Python 3.11 an OS-level connect timeout raises the builtin
+            # TimeoutError rather than asyncio.TimeoutError
+            logging.error(f'Could not find laser at {self._port_num}')
+
+        except ConnectionRefusedError:
+            logging.error(f'Connection refused on port {self._port_num}')
+
+        return result
+    #end def
+
+
+    async def close_connection(self):
+        """
+        Closes the socket connection to the laser.
+        """
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._reader = None
+            self._writer = None
+    #end def
+
+
+    async def send_propget_to_laser(
+            self, tree: bytes, branch: bytes, function: bytes, parameter: bytes
+        ) -> bool:
+        """
+        Queries a property of a function. See MerionLaserConnection.send_propget_to_laser().
+        """
+        packet = MerionLaserConnection.PROPGET_TEMPLATE % (tree, branch, function, parameter)
+        return await self.send_packet_to_laser(packet)
+    #end def
+
+
+    async def send_set_to_laser(
+            self, tree: bytes, branch: bytes, function: bytes, value: bytes
+        ) -> bool:
+        """
+        Sets the value of a function. See MerionLaserConnection.send_set_to_laser().
+        """
+        packet = MerionLaserConnection.SET_TEMPLATE % (tree, branch, function, value)
+        return await self.send_packet_to_laser(packet)
+    #end def
+
+
+    async def send_get_to_laser(self, tree: bytes, branch: bytes, function: bytes) -> bool:
+        """
+        Gets the value of a function. See MerionLaserConnection.send_get_to_laser().
+        """
+        packet = MerionLaserConnection.GET_TEMPLATE % (tree, branch, function)
+        return await self.send_packet_to_laser(packet)
+    #end def
+
+
+    async def send_alias_command_to_laser(self, alias: str, value: str = '') -> bool:
+        """
+        Send a simple (alias) command to the laser. See
+        MerionLaserConnection.send_alias_command_to_laser().
+        """
+        packet = MerionLaserConnection.build_alias_packet(alias, value)
+        return await self.send_packet_to_laser(packet)
+    #end def
+
+
+    async def send_packet_to_laser(self, packet: bytes) -> bool:
+        """
+        Sends a complete packet (command plus SEND_PACKET_TERMINATOR) to the laser.
 
-        # decode response and strip off extraneous characters
-        return result.decode().strip() if result else None
+        Args:
+            packet (bytes): the command, already terminated.
+
+        Returns:
+            bool: True if successful
+        """
+        try:
+            self._writer.write(packet)
+            await self._writer.drain()
+            return True
+
+        except Exception as err:
+            logging.exception(err)
+            return False
+    #end def
+
+
+    async def read_response(self, timeout: Optional[float] = None) -> Optional[bytes]:
+        """
+        Get a response from the laser as raw bytes. See
+        MerionLaserConnection.read_response().
+
+        Args:
+            timeout (float, optional): seconds to wait for the response.
+                Defaults to TIMEOUT.
+
+        Returns:
+            Optional[bytes]: laser response, or None.
+        """
+        assert self._reader, 'Socket connection to laser must be open'
+
+        try:
+            response = await asyncio.wait_for(
+                self._reader.readuntil(self.READ_PACKET_TERMINATOR),
+                timeout=self.TIMEOUT if timeout is None else timeout
+            )
+
+        except asyncio.TimeoutError:
+            log = logging.error if timeout is None else logging.debug
+            log('Timed out waiting for a response from the laser')
+            return None
+
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            logging.error('Connection closed while waiting for a response from the laser')
+            return None
+
+        except asyncio.LimitOverrunError:
+            logging.error('Response from the laser is too long, no terminator found')
+            return None
+
+        # get part of response before the terminator
+        return response[:-len(self.READ_PACKET_TERMINATOR)]
     #end def
 #end class
 
@@ -165,6 +539,13 @@ class MerionCLaser:
     Simple class for controlling a Merion C laser over a socket
     connection.
     """
+    # frequently sent commands, pre-built as complete packets
+    CMD_STATE = b'state' + MerionLaserConnection.SEND_PACKET_TERMINATOR
+    CMD_DPW_MAX_QUERY = MerionLaserConnection.PROPGET_TEMPLATE % (
+        b'osc', b'diode', b'cpw', b'limitmax'
+    )
+
+
     def __init__(self, connection: MerionLaserConnection) -> None:
         """
         Init the class.
@@ -184,11 +565,13 @@ class MerionCLaser:
         Returns:
             int: the state value as a 16bit integer.
         """
-        self._connection.send_alias_command_to_laser('state')
+        self._connection.send_packet_to_laser(self.CMD_STATE)
+        # int() parses the hex digits straight from bytes and ignores the
+        # surrounding whitespace, so the response doesn't need decoding
         resp = self._connection.read_response()
-        if resp:
-            return int(resp, 16)
-        else:
+        try:
+            return int(resp, 16) if resp else -1
+        except ValueError:
             return -1
     #end def
 
@@ -204,18 +587,28 @@ class MerionCLaser:
     #end def
 
 
-    def set_dpw_to_max(self):
+    def set_dpw_to_max(self) -> bool:
         """
         Sets the diode pulse width to its max value. This is just an example of
         how to communicate with the laser to get or set a value.
+
+        Returns:
+            bool: True if the laser responded to the set command.
         """
         # query the laser for its max diode pulse width
-        self._connection.send_command_to_laser('propget', 'osc', 'diode', 'cpw', 'limitmax')
-        dpw_max = self._connection.read_response()
+        self._connection.send_packet_to_laser(self.CMD_DPW_MAX_QUERY)
+        resp = self._connection.read_response()
+        dpw_max = resp.strip() if resp else None
 
         # if query was successful, set the diode pulse width to the max value
-        if dpw_max:
-            self._connection.send_command_to_laser('set', 'osc', 'diode', 'cpw', dpw_max)
+        if not dpw_max:
+            return False
+
+        self._connection.send_set_to_laser(b'osc', b'diode', b'cpw', dpw_max)
+
+        # read the response to the set command too, otherwise it would be
+        # taken as the response to the next command
+        return self._connection.read_response() is not None
     #end def
 #end class
 